@@ -2,12 +2,30 @@ import json
 import os
 from pathlib import Path
 
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import ijson
+
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
 
 class DatasetItem:
     """
     A class to store a dataset item with an image path, caption, and metadata.
     """
 
+    # Datasets can run to hundreds of thousands of items; slots drop the
+    # per-instance __dict__ (~100+ bytes each) and speed up attribute access.
+    __slots__ = ("key", "filename", "image_path", "caption", "metadata")
+
     def __init__(
         self,
         key: str,
@@ -47,13 +65,28 @@ class CaptionDataLoader:
         if not os.path.exists(json_filepath):
             raise FileNotFoundError(f"JSON file not found: {json_filepath}")
         try:
-            with open(json_filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if not isinstance(data, dict):
-                    raise ValueError(
-                        "JSON file should contain a dictionary at the root for the custom format."
-                    )
-                for key, value in data.items():
+            with open(json_filepath, "rb") as f:
+                # ijson streams entries as they are parsed, so huge exports
+                # load in constant memory; otherwise orjson's C parser is
+                # several times faster than json, with stdlib json as the
+                # final fallback.
+                if HAS_IJSON:
+                    entries = ijson.kvitems(f, "")
+                elif HAS_ORJSON:
+                    data = orjson.loads(f.read())
+                    if not isinstance(data, dict):
+                        raise ValueError(
+                            "JSON file should contain a dictionary at the root for the custom format."
+                        )
+                    entries = data.items()
+                else:
+                    data = json.loads(f.read().decode("utf-8"))
+                    if not isinstance(data, dict):
+                        raise ValueError(
+                            "JSON file should contain a dictionary at the root for the custom format."
+                        )
+                    entries = data.items()
+                for key, value in entries:
                     if (
                         not isinstance(value, dict)
                         or "file_attributes" not in value
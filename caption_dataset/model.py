@@ -4,10 +4,35 @@ import os
 import shutil
 import json
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
 import logging
 import hashlib
+import threading
+
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import xxhash
+
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+# Hashing here only detects file changes, so a non-cryptographic hash is
+# fine; xxh3 runs at several GB/s per core against MD5's few hundred MB/s.
+# The "-sparse16k" tag marks the sparse-window fingerprint scheme so caches
+# built from full-content hashes invalidate cleanly.
+HASH_ALGO = ("xxh3_128" if HAS_XXHASH else "md5") + "-sparse16k"
+
+# Bytes hashed at the head, middle and tail of each file.
+SPARSE_WINDOW = 16384
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +41,69 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _json_dumps(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes, via orjson's C encoder when available.
+
+    The cache is machine-read only, so no indentation: indented stdlib
+    json.dump is several times slower and the file is a few times larger.
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+
+# Compact the cache journal into the main cache file after this many appends.
+CACHE_COMPACT_EVERY = 100
+
+
+def _new_hasher():
+    """Return a hasher object for the active change-detection algorithm."""
+    return xxhash.xxh3_128() if HAS_XXHASH else hashlib.md5()
+
+
+try:
+    import fcntl
+
+    # Linux FICLONE ioctl: clone extents on btrfs/XFS, O(1) per file
+    _FICLONE = 0x40049409
+except ImportError:  # non-Linux platforms
+    fcntl = None
+
+
+def _fast_copy(src: "Path | str", dst: "Path | str", mode: str = "copy") -> None:
+    """Copy src to dst using the cheapest mechanism the mode allows.
+
+    "hardlink" and "symlink" cost one syscall but share the inode/path
+    with the source; "reflink" clones extents on btrfs/XFS (O(1)
+    regardless of file size) and falls back to a normal copy on other
+    filesystems; "copy" is shutil.copy2, which already goes through
+    in-kernel sendfile on Linux.
+    """
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    if mode == "hardlink":
+        os.link(src, dst)
+        return
+    if mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+        return
+    if mode == "reflink" and fcntl is not None:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            # Filesystem without reflink support; fall through to copy
+            if os.path.lexists(dst):
+                os.unlink(dst)
+    shutil.copy2(src, dst)
+
+
 class NamingStrategy(ABC):
     """Abstract base class for naming strategies."""
 
@@ -51,6 +139,14 @@ class CaptioningModel(ABC):
         """Generate a caption for the given image."""
         pass
 
+    def generate_captions(self, image_paths: List[Path]) -> List[str]:
+        """Generate captions for a batch of images.
+
+        Models whose backend has a real batched forward pass should
+        override this; the default just loops over generate_caption.
+        """
+        return [self.generate_caption(path) for path in image_paths]
+
 
 class CaptioningPipeline:
     """Pipeline for captioning images and organizing the output."""
@@ -63,6 +159,8 @@ class CaptioningPipeline:
         naming_strategy: Optional[NamingStrategy] = None,
         cache_file: Optional[str] = None,
         extensions: List[str] = [],
+        batch_size: int = 8,
+        copy_mode: str = "copy",
     ):
         self.model = model
         self.source_dir = Path(source_dir)
@@ -79,40 +177,125 @@ class CaptioningPipeline:
             ".gif",
             ".webp",
         ]
+        # Images per generate_captions call; batch=1 leaves GPU lanes idle
+        # in both the vision encoder and the decoder.
+        self.batch_size = max(1, batch_size)
+        # How images reach the target dir: "copy", "reflink", "hardlink"
+        # or "symlink" (see _fast_copy).
+        self.copy_mode = copy_mode
+        # Stringified once here: pathlib arithmetic (`/`, relative_to) in
+        # the per-file loops costs several object allocations per call,
+        # where os.path works on plain strings.
+        self._source_dir_str = str(self.source_dir)
+        self._target_dir_str = str(self.target_dir)
+        # Append-only journal alongside the cache file; entries land here
+        # as each image finishes so a crash mid-run loses nothing.
+        self._journal_path = self.cache_file.with_suffix(".jsonl")
+        self._journal = None
+        self._journal_lock = threading.RLock()
+        self._journal_count = 0
         self.cache = self._load_cache()
 
     def _load_cache(self) -> Dict[str, Dict[str, Any]]:
-        """Load the cache from disk if it exists."""
+        """Load the cache from disk if it exists.
+
+        Reads the compacted cache file, then replays the journal left by
+        any run that did not reach final compaction (last write wins).
+        """
+        cache: Dict[str, Dict[str, Any]] = {}
         if self.cache_file.exists():
             try:
-                with open(self.cache_file, "r") as f:
-                    return json.load(f)
+                with open(self.cache_file, "rb") as f:
+                    cache = _json_loads(f.read())
             except Exception as e:
                 logger.warning(f"Failed to load cache: {e}. Starting with empty cache.")
-                return {}
-        return {}
+                cache = {}
+        if self._journal_path.exists():
+            try:
+                with open(self._journal_path, "rb") as f:
+                    for line in f:
+                        if line.strip():
+                            cache.update(_json_loads(line))
+            except Exception as e:
+                logger.warning(f"Failed to replay cache journal: {e}")
+        return cache
+
+    def _append_journal(self, rel_path: str, entry: Dict[str, Any]) -> None:
+        """Record one finished entry in the cache dict and the journal:
+        O(1) per image instead of rewriting the whole cache, and
+        crash-safe since each line is flushed. Compacts every
+        CACHE_COMPACT_EVERY appends to keep the journal from growing
+        without bound.
+
+        The dict insert happens under the lock too: writer threads run
+        this concurrently, and compaction serializes the whole dict, so
+        an unlocked insert could change its size mid-iteration.
+        """
+        with self._journal_lock:
+            self.cache[rel_path] = entry
+            if self._journal is None:
+                os.makedirs(self.cache_file.parent, exist_ok=True)
+                self._journal = open(self._journal_path, "ab")
+            self._journal.write(_json_dumps({rel_path: entry}) + b"\n")
+            self._journal.flush()
+            self._journal_count += 1
+            if self._journal_count % CACHE_COMPACT_EVERY == 0:
+                self._save_cache()
 
     def _save_cache(self) -> None:
-        """Save the cache to disk."""
-        os.makedirs(self.cache_file.parent, exist_ok=True)
-        with open(self.cache_file, "w") as f:
-            json.dump(self.cache, f, indent=2)
+        """Compact the cache to disk atomically and drop the journal.
 
-    def _get_file_hash(self, file_path: Path) -> str:
-        """Generate a hash for the file to detect changes."""
-        hasher = hashlib.md5()
+        Writing to a temp file then os.replace means a crash can never
+        leave a truncated cache file behind.
+        """
+        os.makedirs(self.cache_file.parent, exist_ok=True)
+        with self._journal_lock:
+            tmp_path = self.cache_file.with_suffix(".json.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(_json_dumps(self.cache))
+            os.replace(tmp_path, self.cache_file)
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self._journal_path.unlink(missing_ok=True)
+
+    def _get_file_hash(self, file_path: "Path | str") -> str:
+        """Generate a fingerprint for the file to detect changes.
+
+        Hashes the file size plus 16 KiB windows at the head, middle and
+        tail instead of every byte: O(1) work per file regardless of size,
+        with negligible collision risk for change detection (any edit that
+        shifts bytes also shifts the size or one of the windows).
+        """
+        hasher = _new_hasher()
+        size = os.stat(file_path).st_size
+        hasher.update(str(size).encode())
         with open(file_path, "rb") as f:
-            buf = f.read(65536)
-            while len(buf) > 0:
-                hasher.update(buf)
-                buf = f.read(65536)
+            hasher.update(f.read(SPARSE_WINDOW))
+            if size > 2 * SPARSE_WINDOW:
+                f.seek(size // 2)
+                hasher.update(f.read(SPARSE_WINDOW))
+            if size > SPARSE_WINDOW:
+                f.seek(max(0, size - SPARSE_WINDOW))
+                hasher.update(f.read(SPARSE_WINDOW))
         return hasher.hexdigest()
 
-    def _get_image_files(self) -> List[Path]:
-        """Get all image files from the source directory."""
+    def _get_image_files(self) -> List[str]:
+        """Get all image files from the source directory.
+
+        Paths stay plain strings here: os.path.join is several times
+        cheaper than Path construction, and nothing on the scan or
+        change-detection path needs a Path object.
+        """
+        # One os.walk traversal with a set-based extension check instead of
+        # one recursive glob (and stat storm) per extension.
+        exts = {ext.lower() for ext in self.extensions}
         image_files = []
-        for ext in self.extensions:
-            image_files.extend(list(self.source_dir.glob(f"**/*{ext}")))
+        for root, _, files in os.walk(self._source_dir_str):
+            for name in files:
+                i = name.rfind(".")
+                if i >= 0 and name[i:].lower() in exts:
+                    image_files.append(os.path.join(root, name))
         return sorted(image_files)
 
     def process(self) -> None:
@@ -123,50 +306,148 @@ class CaptioningPipeline:
         # Create target directory if it doesn't exist
         os.makedirs(self.target_dir, exist_ok=True)
 
-        for idx, image_path in enumerate(image_files):
+        # Run the change-detection checks for all files concurrently before
+        # the caption loop: stat and fingerprint reads are I/O-bound and
+        # the hash update releases the GIL, so threads scale with storage
+        # bandwidth. The model loop itself stays serial.
+        with ThreadPoolExecutor(
+            max_workers=min(32, (os.cpu_count() or 4) * 2)
+        ) as executor:
+            unchanged = list(executor.map(self._is_unchanged, image_files))
+
+        pending = [
+            (idx, image_path)
+            for idx, image_path in enumerate(image_files)
+            if not unchanged[idx]
+        ]
+
+        # Output writes (image copy + caption file) run on a small writer
+        # pool so the next model call starts while the previous batch's
+        # files hit disk — the model no longer waits on I/O.
+        write_futures = []
+        with ThreadPoolExecutor(max_workers=2) as writer:
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start : start + self.batch_size]
+                try:
+                    write_futures.extend(self._process_batch(batch, writer))
+                except Exception as e:
+                    paths = ", ".join(str(p) for _, p in batch)
+                    logger.error(f"Error processing batch [{paths}]: {e}")
+
+        # Surface write errors before the cache is persisted
+        for future in write_futures:
             try:
-                self._process_single_image(image_path, idx)
+                future.result()
             except Exception as e:
-                logger.error(f"Error processing {image_path}: {e}")
+                logger.error(f"Error writing outputs: {e}")
 
         # Save the updated cache
         self._save_cache()
         logger.info("Processing complete")
 
-    def _process_single_image(self, image_path: Path, index: int) -> None:
-        """Process a single image."""
-        rel_path = str(image_path.relative_to(self.source_dir))
-        file_hash = self._get_file_hash(image_path)
-
-        # Check if the image has already been processed and hasn't changed
-        if rel_path in self.cache and self.cache[rel_path]["hash"] == file_hash:
-            logger.debug(f"Skipping {rel_path} (already processed, no changes)")
-            return
-
-        # Generate the target filename
-        target_name = self.naming_strategy.generate_name(image_path, index)
-        target_image_path = self.target_dir / f"{target_name}{image_path.suffix}"
-        target_caption_path = self.target_dir / f"{target_name}.txt"
-
-        # Generate caption
-        logger.info(f"Generating caption for {rel_path}")
-        caption = self.model.generate_caption(image_path)
-
+    def _is_unchanged(self, image_path: str) -> bool:
+        """Return True when the cache already covers this file's content.
+
+        Matching size+mtime is the common case on reruns and settles it
+        with the stat alone — the file is never opened. Otherwise a size
+        mismatch means the file definitely changed, so fingerprint only
+        when sizes agree (e.g. an mtime bumped by a copy). Entries hashed
+        with a different algorithm simply rehash and refresh. A file
+        that cannot be read (dangling symlink, permission error, deleted
+        mid-scan) is logged and skipped rather than aborting the run —
+        the checks run via executor.map, which would re-raise.
+        """
+        rel_path = os.path.relpath(image_path, self._source_dir_str)
+        try:
+            st = os.stat(image_path)
+            cached = self.cache.get(rel_path)
+            if (
+                cached is None
+                or cached.get("hash_algo", "md5") != HASH_ALGO
+                or cached.get("size") != st.st_size
+            ):
+                return False
+            if cached.get("mtime_ns") == st.st_mtime_ns:
+                return True
+            if cached["hash"] == self._get_file_hash(image_path):
+                # Remember the new mtime so the next run stops at the stat.
+                cached["mtime_ns"] = st.st_mtime_ns
+                return True
+            return False
+        except OSError as e:
+            logger.error(f"Error checking {rel_path}, skipping: {e}")
+            return True
+
+    def _process_batch(
+        self,
+        batch: List[Tuple[int, str]],
+        writer: ThreadPoolExecutor,
+    ) -> List[Any]:
+        """Caption a batch of changed images in one model call.
+
+        Output copy/writes are submitted to the writer pool and their
+        futures returned, so the caller can move straight on to the next
+        batch's model call. Path objects are built only here, for the
+        files that actually changed.
+        """
+        prepared = []
+        for index, image_path in batch:
+            src_path = Path(image_path)
+            rel_path = os.path.relpath(image_path, self._source_dir_str)
+            st = os.stat(image_path)
+            file_hash = self._get_file_hash(image_path)
+            target_name = self.naming_strategy.generate_name(src_path, index)
+            suffix = os.path.splitext(image_path)[1]
+            prepared.append((src_path, rel_path, st, file_hash, target_name, suffix))
+            logger.info(f"Generating caption for {rel_path}")
+
+        captions = self.model.generate_captions([item[0] for item in prepared])
+
+        futures = []
+        for (src_path, rel_path, st, file_hash, target_name, suffix), caption in zip(
+            prepared, captions
+        ):
+            entry = {
+                "hash": file_hash,
+                "hash_algo": HASH_ALGO,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "caption": caption,
+                "target_name": target_name,
+            }
+            futures.append(
+                writer.submit(
+                    self._write_outputs,
+                    src_path,
+                    os.path.join(self._target_dir_str, target_name + suffix),
+                    os.path.join(self._target_dir_str, target_name + ".txt"),
+                    rel_path,
+                    entry,
+                )
+            )
+        return futures
+
+    def _write_outputs(
+        self,
+        image_path: Path,
+        target_image_path: str,
+        target_caption_path: str,
+        rel_path: str,
+        entry: Dict[str, Any],
+    ) -> None:
+        """Copy the image, write its caption, then mark it cached."""
         # Copy the image to the target directory
-        shutil.copy2(image_path, target_image_path)
+        _fast_copy(image_path, target_image_path, self.copy_mode)
 
         # Write the caption to a text file
         with open(target_caption_path, "w", encoding="utf-8") as f:
-            f.write(caption)
+            f.write(entry["caption"])
 
-        # Update the cache
-        self.cache[rel_path] = {
-            "hash": file_hash,
-            "caption": caption,
-            "target_name": target_name,
-        }
+        # Only record the file as processed once its outputs are on disk;
+        # the cache insert happens inside _append_journal, under its lock
+        self._append_journal(rel_path, entry)
 
-        logger.info(f"Processed {rel_path} -> {target_name}")
+        logger.info(f"Processed {rel_path} -> {entry['target_name']}")
 
 
 # Add script arguments
@@ -3,10 +3,16 @@ Moondream2 Fine-tuned Model
 """
 
 from pathlib import Path
+from typing import Any, Dict, Tuple
+
 from model import CaptioningModel
 from transformers import AutoModelForCausalLM
 from PIL import Image
 
+# Loaded models keyed by (path, revision), shared across instances so
+# repeated pipeline runs in one process skip the multi-second reload.
+_MODEL_CACHE: Dict[Tuple[str, str], Any] = {}
+
 
 class Gemini2Flash(CaptioningModel):
     """
@@ -16,19 +22,25 @@ class Gemini2Flash(CaptioningModel):
     """
 
     path = "/home/felix/tools/moondream2/models/saved/moondream_base_finetuned_v1_a2_150_best.safetensors"
+    revision = "2025-01-09"
     prompt = "\n\nQuestion: Describe this image.\n\nAnswer:"
 
     def __init__(self, api_key: str):
         self.api_key = api_key
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.path,
-            revision="2025-01-09",
-            trust_remote_code=True,
-            device_map={"": "cuda"},
-        )
+        key = (self.path, self.revision)
+        if key not in _MODEL_CACHE:
+            _MODEL_CACHE[key] = AutoModelForCausalLM.from_pretrained(
+                self.path,
+                revision=self.revision,
+                trust_remote_code=True,
+                device_map={"": "cuda"},
+            )
+        self.model = _MODEL_CACHE[key]
 
     def generate_caption(self, image_path: Path) -> str:
-        img = Image.open(image_path)
+        # Decode fully and normalize the mode up front so the cost is paid
+        # here rather than lazily inside the vision encoder.
+        img = Image.open(image_path).convert("RGB")
         encoded_image = self.model.encode_image(img)
 
         return self.model.query(encoded_image, self.prompt)["answer"]
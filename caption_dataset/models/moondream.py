@@ -3,25 +3,63 @@ Moondream2 Fine-tuned Model
 """
 
 from pathlib import Path
+from typing import Any, Dict, Tuple
+
 from model import CaptioningModel
 from transformers import AutoModelForCausalLM
 from PIL import Image
 
+# Loaded models keyed by (path, revision): reloading the safetensors costs
+# seconds, so repeated pipeline runs in one process reuse the instance.
+_MODEL_CACHE: Dict[Tuple[str, str], Any] = {}
+
+# JPEG draft-mode decode target. The vision encoder resizes to a small
+# fixed input anyway, so decoding 4K/phone-camera JPEGs at full
+# resolution is wasted work; draft decodes at a reduced DCT scale, often
+# 4-8x faster. Kept well above the encoder input size so quality is
+# unaffected.
+_DRAFT_SIZE = (768, 768)
+
+
+def _load_image(image_path: Path) -> Image.Image:
+    """Decode an image for captioning, using JPEG draft mode when possible."""
+    img = Image.open(image_path)
+    img.draft("RGB", _DRAFT_SIZE)
+    return img.convert("RGB")
+
 
 class Moondream(CaptioningModel):
     path = "/home/felix/tools/moondream2/models/saved/moondream_base_finetuned_v1_a2_150_best.safetensors"
+    revision = "2025-01-09"
     prompt = "\n\nQuestion: Describe this image.\n\nAnswer:"
 
     def __init__(self):
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.path,
-            revision="2025-01-09",
-            trust_remote_code=True,
-            device_map={"": "cuda"},
-        )
+        key = (self.path, self.revision)
+        if key not in _MODEL_CACHE:
+            _MODEL_CACHE[key] = AutoModelForCausalLM.from_pretrained(
+                self.path,
+                revision=self.revision,
+                trust_remote_code=True,
+                device_map={"": "cuda"},
+            )
+        self.model = _MODEL_CACHE[key]
 
     def generate_caption(self, image_path: Path) -> str:
-        img = Image.open(image_path)
+        # Decode up front so the cost is paid here rather than lazily
+        # inside the vision encoder.
+        img = _load_image(image_path)
         encoded_image = self.model.encode_image(img)
 
         return self.model.query(encoded_image, self.prompt)["answer"]
+
+    def generate_captions(self, image_paths: list[Path]) -> list[str]:
+        # One batched forward pass fills the GPU lanes that sit idle at
+        # batch=1 in both the vision encoder and the decoder; falls back
+        # to the per-image loop on revisions without batch_answer.
+        if not hasattr(self.model, "batch_answer"):
+            return super().generate_captions(image_paths)
+        images = [_load_image(path) for path in image_paths]
+        return self.model.batch_answer(
+            images=images,
+            prompts=[self.prompt] * len(images),
+        )
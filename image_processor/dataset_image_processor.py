@@ -97,10 +97,15 @@ class DatasetImageProcessor:
 
     def get_image_files(self) -> List[Path]:
         """Get all image files from the input directory."""
+        # One os.walk traversal with a set-based extension check instead of
+        # one recursive glob (and stat storm) per extension and case.
+        exts = set(self.supported_extensions)
         image_files = []
-        for ext in self.supported_extensions:
-            image_files.extend(list(self.input_dir.glob(f"**/*{ext}")))
-            image_files.extend(list(self.input_dir.glob(f"**/*{ext.upper()}")))
+        for root, _, files in os.walk(self.input_dir):
+            for name in files:
+                i = name.rfind(".")
+                if i >= 0 and name[i:].lower() in exts:
+                    image_files.append(Path(root) / name)
 
         return image_files
 
@@ -88,11 +88,15 @@ class ImagePairJoiner:
 
     def find_image_pairs(self) -> Dict[str, Tuple[Path, Path]]:
         """Find all image pairs in the input directory."""
-        # Get all image files
+        # Get all image files in one traversal rather than one recursive
+        # glob per extension and case.
+        exts = set(self.supported_extensions)
         image_files = []
-        for ext in self.supported_extensions:
-            image_files.extend(list(self.input_dir.glob(f"**/*{ext}")))
-            image_files.extend(list(self.input_dir.glob(f"**/*{ext.upper()}")))
+        for root, _, files in os.walk(self.input_dir):
+            for name in files:
+                i = name.rfind(".")
+                if i >= 0 and name[i:].lower() in exts:
+                    image_files.append(Path(root) / name)
 
         # Group images by index
         pairs = {}